@@ -0,0 +1,27 @@
+"""
+Ahead-of-time build of the FFT band kernel (audio_engine._bands_core).
+
+Run once after installing dependencies (and again after changing the kernel):
+
+    python _fft_bands_aot.py
+
+This writes the _fft_bands_compiled extension module next to this file. When it is
+importable, audio_engine uses it instead of JIT-compiling at startup, so there is no
+LLVM work at runtime. The kernel takes the bin->band LUT as an argument, so one export
+covers every (sample_rate, fft_size).
+"""
+
+from pathlib import Path
+
+from numba.pycc import CC
+
+from audio_engine import _bands_core
+
+cc = CC("_fft_bands_compiled")
+cc.output_dir = str(Path(__file__).resolve().parent)
+# (complex64 rfft spectrum, uint8 bin->band bitmask) -> float64 per-band mean magnitudes
+cc.export("bands_core", "f8[:](c8[:], u1[:])")(_bands_core.py_func)
+
+if __name__ == "__main__":
+    cc.compile()
+    print(f"Built {cc.name} in {cc.output_dir}")
@@ -1,21 +1,164 @@
 """Audio processing: FFT, frequency bands, and color mapping for reactive lighting."""
 
+import functools
 import math
 from dataclasses import dataclass
 from typing import Iterator
 
 import numpy as np
+import scipy.fft
+from numba import njit
 
+# Band edges in Hz, in FrequencyBands.values order: low, upper_bass, mid, high, overall
+BAND_EDGES_HZ = ((20, 250), (60, 150), (250, 2000), (2000, 20000), (20, 20000))
 
-@dataclass
+
+@dataclass(init=False, eq=False)
 class FrequencyBands:
-    """Energy levels in low, mid, and high frequency bands (0-1 normalized)."""
+    """
+    Energy levels in low, mid, and high frequency bands (0-1 normalized).
+    Stored as one float32 array (BAND_EDGES_HZ order) so band math can be vectorized;
+    the named properties read single bands.
+    """
+
+    values: np.ndarray  # float32[5]: low, upper_bass, mid, high, overall
+
+    def __init__(self, low: float, upper_bass: float, mid: float, high: float, overall: float):
+        self.values = np.array([low, upper_bass, mid, high, overall], dtype=np.float32)
+
+    @classmethod
+    def from_array(cls, values: np.ndarray) -> "FrequencyBands":
+        """Wrap a float32[5] array in BAND_EDGES_HZ order (not copied)."""
+        bands = cls.__new__(cls)
+        bands.values = values
+        return bands
+
+    @property
+    def low(self) -> float:  # bass 20-250 Hz
+        return float(self.values[0])
+
+    @property
+    def upper_bass(self) -> float:  # upper bass 60-150 Hz (punch, kick)
+        return float(self.values[1])
+
+    @property
+    def mid(self) -> float:  # mids 250-2000 Hz
+        return float(self.values[2])
+
+    @property
+    def high(self) -> float:  # treble 2000-20000 Hz
+        return float(self.values[3])
+
+    @property
+    def overall(self) -> float:  # full-spectrum energy
+        return float(self.values[4])
+
+
+@functools.lru_cache(maxsize=8)
+def _hann(fft_size: int) -> np.ndarray:
+    """Hann window for fft_size as float32, computed once and shared (read-only)."""
+    window = np.hanning(fft_size).astype(np.float32)
+    window.flags.writeable = False
+    return window
+
+
+@functools.lru_cache(maxsize=8)
+def _fft_buffers(fft_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Preallocated float32 (padding, windowed) scratch buffers for fft_size, reused every call."""
+    return np.zeros(fft_size, dtype=np.float32), np.empty(fft_size, dtype=np.float32)
+
+
+@functools.lru_cache(maxsize=8)
+def _band_bins(sample_rate: int, fft_size: int) -> np.ndarray:
+    """(low_bin, high_bin) pairs for each band in BAND_EDGES_HZ, as a (5, 2) int array."""
+    bin_width = sample_rate / fft_size
+    n_bins = fft_size // 2 + 1
+    bins = np.array(
+        [
+            (max(0, int(low_hz / bin_width)), min(int(high_hz / bin_width) + 1, n_bins))
+            for low_hz, high_hz in BAND_EDGES_HZ
+        ],
+        dtype=np.int32,
+    )
+    bins.flags.writeable = False
+    return bins
+
+
+@functools.lru_cache(maxsize=8)
+def _bin_to_band(sample_rate: int, fft_size: int) -> np.ndarray:
+    """Per-rfft-bin uint8 bitmask: bit b is set if the bin falls in band b of BAND_EDGES_HZ."""
+    lut = np.zeros(fft_size // 2 + 1, dtype=np.uint8)
+    for b, (lo, hi) in enumerate(_band_bins(sample_rate, fft_size)):
+        lut[lo:hi] |= 1 << b
+    lut.flags.writeable = False
+    return lut
+
+
+@njit(cache=True, fastmath=True)
+def _bands_core(spectrum: np.ndarray, bin_to_band: np.ndarray) -> np.ndarray:
+    """
+    Mean magnitude of the rfft bins in each band, in a single pass over the spectrum.
+    Each bin is read once and its magnitude added to every band in its bitmask.
+    """
+    n_bands = len(BAND_EDGES_HZ)
+    sums = np.zeros(n_bands)
+    counts = np.zeros(n_bands)
+    for k in range(bin_to_band.shape[0]):
+        mask = bin_to_band[k]
+        if mask == 0:
+            continue
+        re = spectrum[k].real
+        im = spectrum[k].imag
+        mag = math.sqrt(re * re + im * im)
+        for b in range(n_bands):
+            if mask & (1 << b):
+                sums[b] += mag
+                counts[b] += 1.0
+    for b in range(n_bands):
+        if counts[b] > 0:
+            sums[b] /= counts[b]
+    return sums
+
+
+# Reuse the previous bands for near-silent chunks that look like the last one (mic idle,
+# gaps between tracks). Signature = per-lane RMS over REUSE_LANES equal slices of the chunk.
+# Louder audio always gets a fresh FFT: lane RMS can't tell apart two loud chunks with
+# similar loudness but different spectra.
+REUSE_LANES = 16
+REUSE_MAX_RMS = 3e-3  # ~-50 dBFS; only chunks quieter than this are reused
+REUSE_MIN_SIMILARITY = 0.995  # cosine similarity of lane signatures
+REUSE_MAX_RMS_DELTA = 3e-4  # absolute change in overall RMS
+
+# (sample_rate, fft_size, lane signature, rms, bands) of the last computed chunk
+_last_chunk: tuple[int, int, np.ndarray, float, FrequencyBands] | None = None
 
-    low: float  # bass 20-250 Hz
-    upper_bass: float  # upper bass 60-150 Hz (punch, kick)
-    mid: float  # mids 250-2000 Hz
-    high: float  # treble 2000-20000 Hz
-    overall: float  # full-spectrum energy
+
+def _chunk_signature(samples: np.ndarray) -> tuple[np.ndarray, float] | None:
+    """Per-lane RMS signature and overall RMS of a chunk, or None if it's too short to split."""
+    usable = len(samples) - len(samples) % REUSE_LANES
+    if usable == 0:
+        return None
+    lanes = samples[:usable].reshape(REUSE_LANES, -1)
+    lane_power = np.einsum("ij,ij->i", lanes, lanes) / lanes.shape[1]
+    return np.sqrt(lane_power), math.sqrt(float(lane_power.mean()))
+
+
+def _reuse_last_bands(
+    sample_rate: int, fft_size: int, sig: np.ndarray, rms: float
+) -> FrequencyBands | None:
+    """Cached bands if this chunk's signature matches the last computed chunk, else None."""
+    if _last_chunk is None or rms >= REUSE_MAX_RMS:
+        return None
+    last_sr, last_fft, last_sig, last_rms, last_bands = _last_chunk
+    if last_sr != sample_rate or last_fft != fft_size or abs(rms - last_rms) >= REUSE_MAX_RMS_DELTA:
+        return None
+    norms = float(np.linalg.norm(sig)) * float(np.linalg.norm(last_sig))
+    if norms < 1e-12:
+        # Both chunks are digital silence
+        return last_bands
+    if float(np.dot(sig, last_sig)) / norms > REUSE_MIN_SIMILARITY:
+        return last_bands
+    return None
 
 
 def fft_frequency_bands(
@@ -24,42 +167,60 @@ def fft_frequency_bands(
     """
     Compute FFT and return energy in low/mid/high bands.
     Uses approximate ranges: low 20-250Hz, mid 250-2000Hz, high 2000-20000Hz.
+    Near-identical consecutive chunks reuse the previous result instead of re-running the FFT.
     """
-    if len(samples) < fft_size:
-        padding = np.zeros(fft_size - len(samples))
-        samples = np.concatenate([samples, padding])
+    global _last_chunk
+    samples = np.asarray(samples, dtype=np.float32)
+    signature = _chunk_signature(samples[:fft_size])
+    if signature is not None:
+        cached = _reuse_last_bands(sample_rate, fft_size, *signature)
+        if cached is not None:
+            return cached
 
-    window = np.hanning(fft_size)
-    windowed = samples[:fft_size] * window
-    fft_result = np.fft.rfft(windowed)
-    magnitudes = np.abs(fft_result)
+    padded, windowed = _fft_buffers(fft_size)
+    n = len(samples)
+    if n < fft_size:
+        padded[:n] = samples
+        padded[n:] = 0.0
+        samples = padded
 
-    freqs = np.fft.rfftfreq(fft_size, 1.0 / sample_rate)
-    bin_width = sample_rate / fft_size
+    np.multiply(samples[:fft_size], _hann(fft_size), out=windowed)
+    # float32 in -> complex64 out: half the bandwidth of the float64 transform.
+    # windowed is scratch rewritten every call, so the transform may clobber it.
+    fft_result = scipy.fft.rfft(windowed, overwrite_x=True)
 
-    def band_energy(low_hz: float, high_hz: float) -> float:
-        low_bin = int(low_hz / bin_width)
-        high_bin = min(int(high_hz / bin_width) + 1, len(magnitudes))
-        low_bin = max(0, low_bin)
-        if high_bin <= low_bin:
-            return 0.0
-        return float(np.mean(magnitudes[low_bin:high_bin]))
-
-    low_e = band_energy(20, 250)
-    upper_bass_e = band_energy(60, 150)
-    mid_e = band_energy(250, 2000)
-    high_e = band_energy(2000, 20000)
-    overall_e = band_energy(20, 20000)
+    energies = _bands_kernel(fft_result, _bin_to_band(sample_rate, fft_size))
 
     # Normalize to 0-1 range (clip and scale based on typical levels)
-    scale = 1.0 / max(1e-6, max(low_e, upper_bass_e, mid_e, high_e, overall_e) * 2.0)
-    return FrequencyBands(
-        low=min(1.0, low_e * scale),
-        upper_bass=min(1.0, upper_bass_e * scale),
-        mid=min(1.0, mid_e * scale),
-        high=min(1.0, high_e * scale),
-        overall=min(1.0, overall_e * scale),
-    )
+    scale = 1.0 / max(1e-6, float(energies.max()) * 2.0)
+    bands = FrequencyBands.from_array(np.minimum(1.0, energies * scale).astype(np.float32))
+    if signature is not None:
+        _last_chunk = (sample_rate, fft_size, signature[0], signature[1], bands)
+    return bands
+
+
+def prepare_fft(sample_rate: int, fft_size: int) -> None:
+    """
+    Build the window, scratch buffers and band lookup for this sample rate / FFT
+    size, and run one transform so scipy's plan is cached. Call at setup so the
+    first audio frame does no allocation or planning.
+    """
+    _, windowed = _fft_buffers(fft_size)
+    windowed[:] = _hann(fft_size)
+    _bands_kernel(scipy.fft.rfft(windowed, overwrite_x=True), _bin_to_band(sample_rate, fft_size))
+
+
+try:
+    # Ahead-of-time build from `python _fft_bands_aot.py`: no JIT at startup
+    from _fft_bands_compiled import bands_core as _bands_kernel
+except ImportError:
+    _bands_kernel = _bands_core
+    # Compile (or load from the on-disk cache) at import so the first audio frame doesn't stall.
+    # The LUT must be read-only like _bin_to_band's, or this builds a specialization no frame uses.
+    _warm_lut = np.ones(3, dtype=np.uint8)
+    _warm_lut.flags.writeable = False
+    _bands_core(np.zeros(3, dtype=np.complex64), _warm_lut)
+    del _warm_lut
 
 
 def energy_to_hue(energy: float, base_hue: float = 0.0) -> float:
@@ -69,8 +230,11 @@ def energy_to_hue(energy: float, base_hue: float = 0.0) -> float:
 
 def rgb_to_hue(r: float, g: float, b: float) -> float:
     """Convert RGB to hue 0-1. Returns 0 if color is achromatic."""
-    mx = max(r, g, b)
-    mn = min(r, g, b)
+    # Inline comparisons instead of max()/min() calls: this runs per frame
+    mx = r if r > g else g
+    mx = mx if mx > b else b
+    mn = r if r < g else g
+    mn = mn if mn < b else b
     if mx == mn:
         return 0.0
     d = mx - mn
@@ -85,53 +249,102 @@ def rgb_to_hue(r: float, g: float, b: float) -> float:
 
 def hue_to_rgb(hue: float, saturation: float = 1.0, value: float = 1.0) -> tuple[float, float, float]:
     """Convert HSV to RGB. Hue in 0-1, returns (r, g, b) in 0-1."""
+    value = float(value)
     h = hue * 6
-    i = int(h) % 6
-    f = h - int(h)
+    ih = int(h)
+    i = ih % 6
+    f = h - ih
     p = value * (1 - saturation)
     q = value * (1 - saturation * f)
     t = value * (1 - saturation * (1 - f))
-    rgb = [
-        (value, t, p),
-        (q, value, p),
-        (p, value, t),
-        (p, q, value),
-        (t, p, value),
-        (value, p, q),
-    ][i]
-    return (float(rgb[0]), float(rgb[1]), float(rgb[2]))
+    if i == 0:
+        return (value, t, p)
+    if i == 1:
+        return (q, value, p)
+    if i == 2:
+        return (p, value, t)
+    if i == 3:
+        return (p, q, value)
+    if i == 4:
+        return (t, p, value)
+    return (value, p, q)
+
+
+# Per-channel sector offsets for the branchless HSV->RGB form: c = v * (1 - s * clip(min(k, 4 - k), 0, 1))
+# with k = (offset + 6h) mod 6. Equivalent to the six-sector table in hue_to_rgb.
+_HSV_CHANNEL_OFFSETS = np.array([5.0, 3.0, 1.0], dtype=np.float32)
+
+
+def hue_to_rgb_batch(
+    hues: np.ndarray, saturation: float | np.ndarray = 1.0, value: float | np.ndarray = 1.0
+) -> np.ndarray:
+    """
+    Vectorized hue_to_rgb. hues is (N,); saturation/value are scalars or (N,) arrays.
+    Returns an (N, 3) float32 array of (r, g, b) in 0-1.
+    """
+    h6 = np.asarray(hues, dtype=np.float32)[:, None] * 6.0
+    k = (h6 + _HSV_CHANNEL_OFFSETS) % 6.0
+    ramp = np.clip(np.minimum(k, 4.0 - k), 0.0, 1.0)
+    s = np.asarray(saturation, dtype=np.float32)
+    v = np.asarray(value, dtype=np.float32)
+    if s.ndim:
+        s = s[:, None]
+    if v.ndim:
+        v = v[:, None]
+    return (v * (1.0 - s * ramp)).astype(np.float32, copy=False)
 
 
 def energy_to_color(energy: float, base_hue: float = 0.0) -> tuple[float, float, float]:
-    """Map energy to RGB color for lighting. Returns (r, g, b) in 0-1."""
-    hue = energy_to_hue(energy, base_hue)
-    saturation = 0.85
-    value = 0.35 + 0.65 * energy
-    return hue_to_rgb(hue, saturation, value)
+    """
+    Map energy to RGB color for lighting. Returns (r, g, b) in 0-1.
+    Hue from energy_to_hue, saturation 0.85, value rising with energy.
+    """
+    return hue_to_rgb((base_hue + energy * 0.7) % 1.0, 0.85, 0.35 + 0.65 * energy)
+
+
+# energy_to_color_lut: unit-value (v = 1) RGB at saturation 0.85 for HUE_LUT_SIZE evenly
+# spaced hues. HSV->RGB is linear in value, so any energy's color is a row scaled by v.
+# Nearest-entry hue error (1/8192) moves a channel by < 1e-3, under one 8-bit level.
+HUE_LUT_SIZE = 4096  # power of two: hue wraparound is an index mask
+_UNIT_HUE_RGB = hue_to_rgb_batch(np.arange(HUE_LUT_SIZE) / HUE_LUT_SIZE, 0.85, 1.0)
+_UNIT_HUE_RGB.flags.writeable = False
+
+
+def energy_to_color_lut(energy: float, base_hues: np.ndarray) -> np.ndarray:
+    """
+    energy_to_color for one energy over (N,) non-negative base hues, via the unit-value
+    hue table. Returns (N, 3) float32. Use for per-light colors where only hue varies.
+    """
+    idx = (base_hues + (energy * 0.7)) * HUE_LUT_SIZE + 0.5
+    idx = idx.astype(np.intp) & (HUE_LUT_SIZE - 1)
+    return _UNIT_HUE_RGB[idx] * np.float32(0.35 + 0.65 * energy)
+
+
+# bands_to_hue weights over FrequencyBands.values: low=red (0), mid=green (0.33), high=blue (0.66)
+_HUE_WEIGHTS = np.array([0.0, 0.0, 0.33, 0.66, 0.0], dtype=np.float32)
+_HUE_BANDS = np.array([1.0, 0.0, 1.0, 1.0, 0.0], dtype=np.float32)
 
 
 def bands_to_hue(bands: "FrequencyBands") -> float:
     """Map frequency bands to hue across full spectrum: low=red, mid=green, high=blue."""
-    # Low=0, Mid=0.33, High=0.66, blend by energy
-    low_w = bands.low
-    mid_w = bands.mid
-    high_w = bands.high
-    total = low_w + mid_w + high_w + 1e-6
-    hue = (0.0 * low_w + 0.33 * mid_w + 0.66 * high_w) / total
-    return hue % 1.0
+    # Energy-weighted blend of the low/mid/high hues, as two dot products
+    v = bands.values
+    return float(_HUE_WEIGHTS @ v) / (float(_HUE_BANDS @ v) + 1e-6) % 1.0
 
 
 def lerp(a: float, b: float, t: float) -> float:
     """Linear interpolation."""
-    return a + (b - a) * max(0, min(1, t))
+    t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+    return a + (b - a) * t
 
 
 def lerp_color(
     c1: tuple[float, float, float], c2: tuple[float, float, float], t: float
 ) -> tuple[float, float, float]:
     """Linear interpolation between two RGB colors."""
+    t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
     return (
-        lerp(c1[0], c2[0], t),
-        lerp(c1[1], c2[1], t),
-        lerp(c1[2], c2[2], t),
+        c1[0] + (c2[0] - c1[0]) * t,
+        c1[1] + (c2[1] - c1[1]) * t,
+        c1[2] + (c2[2] - c1[2]) * t,
     )
@@ -1,12 +1,38 @@
 """Audio capture from microphone, file, or PipeWire/Pulse source by name."""
 
+import functools
+import math
+import queue
 import shutil
 import subprocess
+import threading
+import time
+from collections import deque
 from pathlib import Path
 
 import numpy as np
 import sounddevice as sd
 import soundfile as sf
+from scipy.signal import firwin, upfirdn
+
+
+@functools.lru_cache(maxsize=1)
+def _query_devices() -> tuple:
+    """All PortAudio devices, queried once. Call invalidate_device_cache() after hotplug."""
+    return tuple(sd.query_devices())
+
+
+def _query_device(idx: int | str):
+    """Info for one device, from the cached device list when idx is a plain index."""
+    devices = _query_devices()
+    if isinstance(idx, int) and 0 <= idx < len(devices):
+        return devices[idx]
+    return sd.query_devices(idx)
+
+
+def invalidate_device_cache() -> None:
+    """Forget cached device info (e.g. after plugging in a new audio device)."""
+    _query_devices.cache_clear()
 
 
 def get_default_input_device_index() -> int | None:
@@ -28,7 +54,7 @@ def get_default_input_device_name() -> str:
     if idx is None:
         return "system default (unknown)"
     try:
-        dev = sd.query_devices(idx)
+        dev = _query_device(idx)
         if hasattr(dev, "get"):
             return dev.get("name", str(dev))
         return str(dev).split("\n")[0].strip() if dev else "unknown"
@@ -40,9 +66,7 @@ def list_input_devices() -> list[tuple[int, str]]:
     """Return list of (device_index, name) for all input-capable devices."""
     result = []
     try:
-        devices = sd.query_devices()
-        for i in range(len(devices)):
-            dev = sd.query_devices(i)
+        for i, dev in enumerate(_query_devices()):
             if hasattr(dev, "get"):
                 max_in = dev.get("max_input_channels", 0)
                 name = dev.get("name", f"Device {i}")
@@ -75,7 +99,7 @@ def get_default_output_device_name() -> str:
     if idx is None:
         return "system default (unknown)"
     try:
-        dev = sd.query_devices(idx)
+        dev = _query_device(idx)
         if hasattr(dev, "get"):
             return dev.get("name", str(dev))
         return str(dev).split("\n")[0].strip() if dev else "unknown"
@@ -89,12 +113,13 @@ def find_monitor_of_output(output_name: str) -> int | None:
     Returns device index or None if not found. Names are matched case-insensitively.
     """
     output_lower = output_name.lower()
-    for idx, name in list_input_devices():
+    inputs = list_input_devices()
+    for idx, name in inputs:
         name_lower = name.lower()
         if "monitor" in name_lower and output_lower in name_lower:
             return idx
     # Some systems name it "Monitor of X" - try partial match
-    for idx, name in list_input_devices():
+    for idx, name in inputs:
         name_lower = name.lower()
         if "monitor" in name_lower and any(
             part in name_lower for part in output_lower.split()
@@ -107,9 +132,7 @@ def list_output_devices() -> list[tuple[int, str]]:
     """Return list of (device_index, name) for all output-capable devices."""
     result = []
     try:
-        devices = sd.query_devices()
-        for i in range(len(devices)):
-            dev = sd.query_devices(i)
+        for i, dev in enumerate(_query_devices()):
             if hasattr(dev, "get"):
                 max_out = dev.get("max_output_channels", 0)
                 name = dev.get("name", f"Device {i}")
@@ -123,23 +146,67 @@ def list_output_devices() -> list[tuple[int, str]]:
     return result
 
 
-def read_audio_file(path: str, sample_rate: int) -> tuple[np.ndarray, int]:
-    """Read audio file, return (samples, sample_rate). Resample if needed."""
-    data, sr = sf.read(path, dtype="float32")
-    if data.ndim > 1:
-        data = data.mean(axis=1)
-    if sr != sample_rate:
-        # Simple resample: linear interpolation
-        duration = len(data) / sr
-        new_len = int(duration * sample_rate)
-        indices = np.linspace(0, len(data) - 1, new_len)
-        data = np.interp(indices, np.arange(len(data)), data)
-        sr = sample_rate
-    return data, sr
+@functools.lru_cache(maxsize=8)
+def _resample_filter(up: int, down: int) -> np.ndarray:
+    """Anti-aliasing FIR for resampling by up/down: resample_poly's default design, built once per ratio."""
+    max_rate = max(up, down)
+    taps = firwin(20 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0)).astype(np.float32)
+    taps.flags.writeable = False
+    return taps
+
+
+class _StreamResampler:
+    """
+    Polyphase resampler for a stream fed in blocks, with the output resample_poly
+    would give for the whole stream at once: the tail of each block is kept as filter
+    history, so block boundaries add no edge transients. Output lags the input by half
+    the filter length (about 10 source samples).
+    """
+
+    def __init__(self, from_rate: int, to_rate: int):
+        g = math.gcd(from_rate, to_rate)
+        self.up, self.down = to_rate // g, from_rate // g
+        self._h = _resample_filter(self.up, self.down) * np.float32(self.up)
+        self._half_len = (len(self._h) - 1) // 2
+        # Source samples of history needed so each output's filter span is covered
+        self._context = -(-(2 * self._half_len + self.down) // self.up) + 1
+        self._tail = np.zeros(self._context, dtype=np.float32)  # silence before the stream
+        self._fed = 0  # source samples fed so far
+        self._emitted = 0  # output samples returned so far
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Resample the next block; returns every output sample its inputs now fully cover."""
+        up, down, half_len = self.up, self.down, self._half_len
+        x = np.concatenate([self._tail, block])
+        start = self._fed - self._context  # source index of x[0]
+        self._fed += len(block)
+        self._tail = x[-self._context :]
+        # Output m is centered on upsampled index m * down and needs inputs up to
+        # m * down + half_len; emit all outputs whose span ends inside this block
+        end = -(-(up * self._fed - half_len) // down)
+        count = end - self._emitted
+        if count <= 0:
+            return np.empty(0, dtype=np.float32)
+        # Position of the first output's filter end relative to x, in upsampled samples;
+        # pre-pad the filter so it falls on upfirdn's decimation grid
+        offset = self._emitted * down + half_len - up * start
+        pad = -offset % down
+        h = np.concatenate([np.zeros(pad, dtype=np.float32), self._h]) if pad else self._h
+        first = (offset + pad) // down
+        out = upfirdn(h, x, up, down)[first : first + count]
+        self._emitted = end
+        return out.astype(np.float32, copy=False)
 
 
 class MicrophoneSource:
-    """Stream audio from microphone in chunks."""
+    """
+    Stream audio from microphone in chunks.
+    PortAudio delivers chunks to a callback, which queues a 1-D copy of the
+    channel; read() takes the oldest queued chunk.
+    """
+
+    # Chunks buffered between callback and read(); oldest dropped when full
+    QUEUE_CHUNKS = 4
 
     def __init__(
         self,
@@ -151,6 +218,7 @@ class MicrophoneSource:
         self.chunk_size = chunk_size
         self.device = device  # None = default, int = index, str = device name
         self._stream: sd.InputStream | None = None
+        self._chunks: queue.Queue[np.ndarray] = queue.Queue(maxsize=self.QUEUE_CHUNKS)
 
     def _resolve_device(self) -> int | None:
         if self.device is None:
@@ -168,14 +236,14 @@ class MicrophoneSource:
             return get_default_input_device_name()
         if isinstance(self.device, int):
             try:
-                dev = sd.query_devices(self.device)
+                dev = _query_device(self.device)
                 return dev.get("name", str(dev)) if hasattr(dev, "get") else str(dev).split("\n")[0]
             except Exception:
                 return f"device index {self.device}"
         dev = self._resolve_device()
         if dev is not None:
             try:
-                info = sd.query_devices(dev)
+                info = _query_device(dev)
                 return info.get("name", str(info)) if hasattr(info, "get") else str(info).split("\n")[0]
             except Exception:
                 pass
@@ -187,18 +255,32 @@ class MicrophoneSource:
             channels=1,
             dtype="float32",
             blocksize=self.chunk_size,
+            callback=self._callback,
         )
         dev = self._resolve_device()
         if dev is not None:
             kwargs["device"] = dev
+        self._chunks = queue.Queue(maxsize=self.QUEUE_CHUNKS)
         self._stream = sd.InputStream(**kwargs)
         self._stream.start()
 
+    def _callback(self, indata: np.ndarray, frames: int, time_info, status) -> None:
+        # indata is only valid during the callback: copy the single channel out (1-D, float32)
+        chunk = indata[:, 0].copy()
+        try:
+            self._chunks.put_nowait(chunk)
+        except queue.Full:
+            # Reader fell behind: drop the oldest chunk so reads stay close to real time
+            try:
+                self._chunks.get_nowait()
+            except queue.Empty:
+                pass
+            self._chunks.put_nowait(chunk)
+
     def read(self) -> np.ndarray:
         if not self._stream:
             raise RuntimeError("Stream not started")
-        chunk, _ = self._stream.read(self.chunk_size)
-        return chunk.flatten()
+        return self._chunks.get()
 
     def stop(self) -> None:
         if self._stream:
@@ -219,7 +301,9 @@ class PulseSource:
         self.sample_rate = sample_rate
         self.chunk_size = chunk_size
         self._process: subprocess.Popen | None = None
-        self._buf = bytearray()
+        # One chunk of f32le samples, filled in place via readinto (no bytearray growth)
+        self._buf = np.empty(chunk_size, dtype=np.float32)
+        self._buf_bytes = memoryview(self._buf).cast("B")
         self._use_ffmpeg = shutil.which("ffmpeg") is not None
 
     def get_input_description(self) -> str:
@@ -263,20 +347,18 @@ class PulseSource:
                 stdout=subprocess.PIPE,
                 stderr=subprocess.DEVNULL,
             )
-        self._buf = bytearray()
 
     def read(self) -> np.ndarray:
         if not self._process or self._process.poll() is not None:
             raise RuntimeError("capture process not running")
-        need = self.chunk_size * 4  # f32le = 4 bytes per sample
-        while len(self._buf) < need:
-            chunk = self._process.stdout.read(need - len(self._buf))
-            if not chunk:
+        need = self._buf_bytes.nbytes  # f32le = 4 bytes per sample
+        filled = 0
+        while filled < need:
+            n = self._process.stdout.readinto(self._buf_bytes[filled:])
+            if not n:
                 break
-            self._buf.extend(chunk)
-        out = bytes(self._buf[:need])
-        del self._buf[:need]
-        return np.frombuffer(out, dtype=np.float32)
+            filled += n
+        return self._buf[: filled // 4].copy()
 
     def stop(self) -> None:
         if self._process:
@@ -290,39 +372,116 @@ def pulse_source_available() -> bool:
 
 
 class FileSource:
-    """Stream audio from file in chunks (looping)."""
+    """
+    Stream audio from file in chunks (looping).
+    The file is decoded, downmixed and resampled one block at a time, so memory
+    use doesn't grow with file length.
+    """
+
+    # Source frames decoded per block (~1.5 s at 44.1 kHz)
+    BLOCK_FRAMES = 65536
 
     def __init__(self, path: str, sample_rate: int, chunk_size: int):
         self.path = Path(path)
         self.sample_rate = sample_rate
         self.chunk_size = chunk_size
-        self._data: np.ndarray | None = None
-        self._pos = 0
+        self._file: sf.SoundFile | None = None
+        self._pending = np.empty(0, dtype=np.float32)  # decoded samples not yet returned
+        self._resampler: _StreamResampler | None = None
 
     def start(self) -> None:
-        self._data, _ = read_audio_file(str(self.path), self.sample_rate)
-        self._pos = 0
+        self._file = sf.SoundFile(str(self.path))
+        self._pending = np.empty(0, dtype=np.float32)
+        # One resampler for the whole playback (loops included), so its filter history
+        # carries across blocks
+        self._resampler = None
+        if self._file.samplerate != self.sample_rate:
+            self._resampler = _StreamResampler(self._file.samplerate, self.sample_rate)
+
+    def _next_block(self) -> np.ndarray:
+        """Decode the next block as mono float32 at sample_rate, looping at end of file."""
+        block = self._file.read(self.BLOCK_FRAMES, dtype="float32", always_2d=True)
+        if len(block) == 0:
+            self._file.seek(0)
+            block = self._file.read(self.BLOCK_FRAMES, dtype="float32", always_2d=True)
+            if len(block) == 0:
+                raise RuntimeError(f"No audio in {self.path}")
+        data = block.mean(axis=1, dtype=np.float32)
+        if self._resampler is not None:
+            data = self._resampler.process(data)
+        return data
 
     def read(self) -> np.ndarray:
-        if self._data is None:
+        if self._file is None:
             raise RuntimeError("File not loaded")
-        start = self._pos
-        end = start + self.chunk_size
-        if end > len(self._data):
-            chunk = np.concatenate([
-                self._data[start:],
-                self._data[: end - len(self._data)],
-            ])
-            self._pos = end - len(self._data)
-        else:
-            chunk = self._data[start:end].copy()
-            self._pos = end
+        while len(self._pending) < self.chunk_size:
+            self._pending = np.concatenate([self._pending, self._next_block()])
+        chunk = self._pending[: self.chunk_size]
+        self._pending = self._pending[self.chunk_size :]
         return chunk
 
     def stop(self) -> None:
-        self._data = None
-        self._pos = 0
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._pending = np.empty(0, dtype=np.float32)
 
     def get_input_description(self) -> str:
         """Human-readable description (for startup message)."""
         return str(self.path)
+
+
+class AudioReader:
+    """
+    Read an audio source on a background thread, keeping only the newest chunk.
+    A blocking read (mic queue, ffmpeg pipe) then never stalls the light loop,
+    and a slow light loop just skips stale chunks.
+    pace=True sleeps one chunk duration between reads, for sources like FileSource
+    whose read() returns immediately.
+    """
+
+    def __init__(self, source, pace: bool = False):
+        self.source = source
+        self.pace = pace
+        self._latest: deque[np.ndarray] = deque(maxlen=1)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._error: BaseException | None = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audio-reader", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        chunk_seconds = self.source.chunk_size / self.source.sample_rate
+        deadline = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                self._latest.append(self.source.read())
+                if self.pace:
+                    deadline += chunk_seconds
+                    delay = deadline - time.monotonic()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                    else:
+                        deadline = time.monotonic()
+        except Exception as e:
+            if not self._stop.is_set():
+                self._error = e
+
+    def latest(self) -> np.ndarray | None:
+        """Newest chunk not yet returned, or None if nothing new arrived (non-blocking)."""
+        if self._error is not None:
+            raise RuntimeError(f"audio reader stopped: {self._error}") from self._error
+        try:
+            return self._latest.popleft()
+        except IndexError:
+            return None
+
+    def stop(self, timeout: float = 0.5) -> None:
+        """Stop the thread (doesn't stop the source)."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
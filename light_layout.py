@@ -4,6 +4,8 @@ from dataclasses import dataclass, field
 from enum import Enum
 from typing import Iterator
 
+import numpy as np
+
 
 class Zone(Enum):
     """Spatial zones for light placement."""
@@ -15,6 +17,16 @@ class Zone(Enum):
     TOP = "top"
     BOTTOM = "bottom"
 
+    @property
+    def id(self) -> int:
+        """Small integer id (0-5), used to index per-zone arrays instead of comparing enums."""
+        return _ZONE_IDS[self]
+
+
+# Zones in the order lights are numbered (global_index)
+ZONE_ORDER = (Zone.LEFT, Zone.RIGHT, Zone.FRONT, Zone.BACK, Zone.TOP, Zone.BOTTOM)
+_ZONE_IDS = {zone: i for i, zone in enumerate(ZONE_ORDER)}
+
 
 @dataclass
 class LightDescriptor:
@@ -26,6 +38,15 @@ class LightDescriptor:
     zone_count: int
 
 
+@dataclass
+class LightArrays:
+    """Struct-of-arrays view of a layout: one entry per light, indexed by global_index."""
+
+    zone_ids: np.ndarray  # uint8, Zone.id
+    zone_indices: np.ndarray  # int32, index within the zone
+    zone_counts: np.ndarray  # int32, number of lights in the light's zone
+
+
 @dataclass
 class LightLayout:
     """
@@ -39,6 +60,9 @@ class LightLayout:
     back: int = 0
     top: int = 0
     bottom: int = 0
+    _arrays: tuple[tuple[int, ...], LightArrays] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @classmethod
     def from_dict(cls, d: dict) -> "LightLayout":
@@ -57,17 +81,14 @@ class LightLayout:
             + self.back + self.top + self.bottom
         )
 
+    def _zone_counts(self) -> tuple[int, ...]:
+        """Light count per zone, in ZONE_ORDER."""
+        return (self.left, self.right, self.front, self.back, self.top, self.bottom)
+
     def iter_lights(self) -> Iterator[LightDescriptor]:
         """Iterate over all lights with zone and index."""
         idx = 0
-        for zone, count in [
-            (Zone.LEFT, self.left),
-            (Zone.RIGHT, self.right),
-            (Zone.FRONT, self.front),
-            (Zone.BACK, self.back),
-            (Zone.TOP, self.top),
-            (Zone.BOTTOM, self.bottom),
-        ]:
+        for zone, count in zip(ZONE_ORDER, self._zone_counts()):
             for zi in range(count):
                 yield LightDescriptor(
                     global_index=idx,
@@ -77,21 +98,29 @@ class LightLayout:
                 )
                 idx += 1
 
+    def arrays(self) -> LightArrays:
+        """
+        Per-light zone data as NumPy arrays, for vectorized callers.
+        Built once and reused until a zone count changes.
+        """
+        counts = self._zone_counts()
+        if self._arrays is None or self._arrays[0] != counts:
+            count_arr = np.array(counts, dtype=np.int32)
+            arrays = LightArrays(
+                zone_ids=np.repeat(np.arange(len(ZONE_ORDER), dtype=np.uint8), count_arr),
+                zone_indices=np.concatenate(
+                    [np.arange(c, dtype=np.int32) for c in counts]
+                ),
+                zone_counts=np.repeat(count_arr, count_arr),
+            )
+            for arr in (arrays.zone_ids, arrays.zone_indices, arrays.zone_counts):
+                arr.flags.writeable = False
+            self._arrays = (counts, arrays)
+        return self._arrays[1]
+
     def zone_count(self, zone: Zone) -> int:
-        m = {
-            Zone.LEFT: self.left,
-            Zone.RIGHT: self.right,
-            Zone.FRONT: self.front,
-            Zone.BACK: self.back,
-            Zone.TOP: self.top,
-            Zone.BOTTOM: self.bottom,
-        }
-        return m.get(zone, 0)
+        return self._zone_counts()[zone.id]
 
     def lights_in_zone(self, zone: Zone) -> list[int]:
         """Return global indices of all lights in the given zone."""
-        return [
-            ld.global_index
-            for ld in self.iter_lights()
-            if ld.zone == zone
-        ]
+        return np.flatnonzero(self.arrays().zone_ids == zone.id).tolist()
@@ -8,13 +8,15 @@ and control lights in Resonite with audio-reactive patterns.
 
 import argparse
 import asyncio
+import copy
 import sys
 from pathlib import Path
 
 import yaml
 
-from audio_engine import fft_frequency_bands
+from audio_engine import fft_frequency_bands, prepare_fft
 from audio_source import (
+    AudioReader,
     MicrophoneSource,
     FileSource,
     PulseSource,
@@ -32,14 +34,26 @@ from pattern_engine import Pattern, PatternEngine
 from resonite_client import ResoniteClient
 
 
+# libyaml's C parser when PyYAML was built with it, else the pure-Python one
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+# Resolved path -> (mtime_ns, parsed config): re-loading an unchanged file skips parsing
+_config_cache: dict[str, tuple[int, dict]] = {}
+
+
 def load_config(path: str | None = None) -> dict:
     config_path = path or "config.yaml"
     if not Path(config_path).exists():
         config_path = "config.example.yaml"
     if not Path(config_path).exists():
         return {}
-    with open(config_path) as f:
-        return yaml.safe_load(f) or {}
+    resolved = str(Path(config_path).resolve())
+    mtime = Path(resolved).stat().st_mtime_ns
+    cached = _config_cache.get(resolved)
+    if cached is None or cached[0] != mtime:
+        with open(resolved) as f:
+            cached = _config_cache[resolved] = (mtime, yaml.load(f, Loader=_YAML_LOADER) or {})
+    # Callers may modify the dict, so hand out a copy
+    return copy.deepcopy(cached[1])
 
 
 def parse_layout(config: dict) -> LightLayout:
@@ -101,7 +115,7 @@ async def run(
     print(f"Pattern: {pattern.value}")
     print(f"Connecting to Resonite at {resonite_url}...")
 
-    client = ResoniteClient(url=resonite_url)
+    client = ResoniteClient(url=resonite_url, compression=config.get("resonite_compression", True))
     try:
         await client.connect()
     except OSError:
@@ -132,6 +146,7 @@ async def run(
         or audio_pulse_source
     )
     audio = None
+    reader: AudioReader | None = None
     chunk_size = fft_size
     if not demo:
         if use_speakers:
@@ -161,6 +176,10 @@ async def run(
             await client.teardown()
             await client.disconnect()
             sys.exit(1)
+        prepare_fft(sample_rate, fft_size)
+        # Capture on a background thread; the frame loop takes the newest chunk
+        reader = AudioReader(audio, pace=isinstance(audio, FileSource))
+        reader.start()
         kind = "pulse" if isinstance(audio, PulseSource) else "microphone" if isinstance(audio, MicrophoneSource) else "file"
         print(f"Audio: {kind} ({audio.get_input_description()})")
     else:
@@ -181,22 +200,44 @@ async def run(
 
     print("Running. Press Ctrl+C to stop.")
 
+    loop = asyncio.get_running_loop()
+    send_task: asyncio.Task | None = None
+    bands = None  # demo mode, or no audio chunk yet
     try:
+        # Fixed-rate ticks on absolute deadlines so sleep overshoot doesn't accumulate
+        next_deadline = loop.time() + interval
         while True:
-            loop_start = asyncio.get_running_loop().time()
-            if audio:
-                samples = audio.read()
-                bands = fft_frequency_bands(samples, sample_rate, fft_size)
-            else:
-                bands = None  # demo: no audio
+            if reader:
+                # No new chunk since last frame: keep the previous bands
+                samples = reader.latest()
+                if samples is not None:
+                    bands = fft_frequency_bands(samples, sample_rate, fft_size)
             states = pattern_engine.compute(pattern, bands)
-            await client.update_lights(states)
+            # Pipeline: the previous frame's send drains while this frame was computed.
+            # compute() reuses its buffer, so the in-flight send gets its own copy.
+            # update_lights skips lights whose 8-bit levels didn't change, so an
+            # identical frame (static pattern, silence) sends nothing.
+            if send_task:
+                await send_task
+            send_task = asyncio.create_task(client.update_lights(states.copy()))
 
-            elapsed = asyncio.get_running_loop().time() - loop_start
-            await asyncio.sleep(max(0, interval - elapsed))
+            now = loop.time()
+            if now - next_deadline > interval:
+                # Fell more than a frame behind: skip missed ticks instead of bursting
+                next_deadline = now
+            await asyncio.sleep(max(0.0, next_deadline - now))
+            next_deadline += interval
     except KeyboardInterrupt:
         pass
     finally:
+        if send_task:
+            # Let the last frame's messages go out before teardown removes the lights
+            try:
+                await send_task
+            except Exception:
+                pass
+        if reader:
+            reader.stop()
         if audio:
             audio.stop()
         await client.teardown()
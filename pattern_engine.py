@@ -2,17 +2,23 @@
 
 import math
 import time
+from collections import deque
+from collections.abc import Callable
 from dataclasses import dataclass
 from enum import Enum
 
+import numpy as np
+from numba import njit
+
 from audio_engine import (
     FrequencyBands,
     bands_to_hue,
     energy_to_color,
+    energy_to_color_lut,
     hue_to_rgb,
     rgb_to_hue,
 )
-from light_layout import LightLayout, LightDescriptor, Zone
+from light_layout import ZONE_ORDER, LightLayout, Zone
 
 
 class Pattern(Enum):
@@ -36,15 +42,104 @@ class Pattern(Enum):
     BEAT_HUE = "beat_hue"          # hue jumps on beat detection; intensity pulses with bass
 
 
-@dataclass
-class LightState:
-    """Per-light state: color (r,g,b), intensity (0-1), optional rotation_y (radians)."""
+@njit(cache=True, fastmath=True, boundscheck=False)
+def _chase_kernel(
+    global_idx: np.ndarray, head_pos: float, n: int, tail_len: int, gain: float, out: np.ndarray
+) -> None:
+    """
+    Fused chase/swirl ring: 1 at the head, fading over tail_len lights behind it,
+    times gain (bass boost) and capped at 1.
+    """
+    for i in range(global_idx.shape[0]):
+        dist = (global_idx[i] - head_pos + n) % n
+        out[i] = min(1.0, (1.0 - dist / (tail_len + 1)) * gain) if dist <= tail_len else 0.0
+
+
+@njit(cache=True, fastmath=True, boundscheck=False)
+def _front_to_back_kernel(wave_pos: np.ndarray, phase: float, gain: float, out: np.ndarray) -> None:
+    """
+    Fused front-to-back wave: intensity falls off with circular distance from phase,
+    times gain (bass boost) and capped at 1.
+    """
+    for i in range(wave_pos.shape[0]):
+        dist = abs(wave_pos[i] - phase)
+        dist = min(dist, 1.0 - dist)
+        out[i] = min(1.0, max(0.0, 1.0 - dist * 3) * gain)
+
+
+@njit(cache=True, fastmath=True, boundscheck=False)
+def _center_out_kernel(
+    center_dist: np.ndarray, center: np.ndarray, phase: float, out: np.ndarray
+) -> None:
+    """Per zone: lit radius grows from the middle 2 lights (phase 0) to the full zone (phase 1)."""
+    for i in range(center_dist.shape[0]):
+        dist = center_dist[i]
+        lit_radius = 0.5 + phase * center[i]  # min radius 0.5, max center + 0.5
+        out[i] = max(0.0, 1.0 - (dist / max(lit_radius, 0.01)) * 0.3) if dist <= lit_radius else 0.0
+
+
+@njit(cache=True, fastmath=True, boundscheck=False)
+def _left_right_alt_kernel(
+    side: np.ndarray,
+    first_half: np.ndarray,
+    left_on: float,
+    level: float,
+    out: np.ndarray,
+) -> None:
+    """
+    side: -1 left zone, 1 right zone, 0 other. Left/right zones take left_on/right_on;
+    in other zones, first_half lights follow left and the rest follow right, scaled by level.
+    """
+    right_on = 1.0 - left_on
+    for i in range(side.shape[0]):
+        if side[i] < 0:
+            out[i] = left_on
+        elif side[i] > 0:
+            out[i] = right_on
+        else:
+            out[i] = (left_on if first_half[i] else right_on) * level
+
+
+# Compile (or load from the on-disk cache) at import so the first frame doesn't stall
+_warm = np.zeros(1)
+_chase_kernel(_warm, 0.0, 1, 1, 1.0, _warm)
+_front_to_back_kernel(_warm, 0.0, 1.0, _warm)
+_center_out_kernel(_warm, _warm, 0.0, _warm)
+_left_right_alt_kernel(np.zeros(1, dtype=np.int8), np.zeros(1, dtype=np.bool_), 0.0, 1.0, _warm)
+del _warm
+
+
+# Frame states are one float32 (n, 5) array, a row per light:
+# (r, g, b, intensity 0-1, rotation_y radians about Y; NaN = no rotation update)
+STATE_R, STATE_G, STATE_B, STATE_INTENSITY, STATE_ROTATION_Y = range(5)
+STATE_COLUMNS = 5
 
-    r: float
-    g: float
-    b: float
-    intensity: float
-    rotation_y: float | None = None  # radians, Y-axis; None = no rotation update
+
+# Patterns that already map bass to intensity (or are static on/off masks)
+NO_BASS_BOOST = frozenset((
+    Pattern.LEFT_OFF, Pattern.RIGHT_OFF, Pattern.LEFT_RIGHT_ALT, Pattern.CENTER_OUT,
+    Pattern.UPPER_BASS, Pattern.BASS_FLOOD, Pattern.BAND_SPLIT, Pattern.BEAT_HUE,
+))
+
+
+@dataclass(slots=True)
+class FrameContext:
+    """Per-frame scalars derived once in compute() and shared by every pattern kernel."""
+
+    phase: float
+    bands: FrequencyBands | None
+    colors: np.ndarray  # default per-light colors (n, 3)
+    pattern_hue: float  # bands_to_hue(bands), or the slow time hue drift without audio
+    bass_gain: float  # 0.7 + 0.3 * low for bass-boosted patterns (1.0 without audio)
+    low: float  # band levels; 0.5 without audio
+    upper_bass: float
+    overall: float
+
+
+# (frame context, bass gain) -> (intensity (n,), color (n, 3))
+PatternKernel = Callable[[FrameContext, float], tuple[np.ndarray, np.ndarray]]
+# A PatternKernel with its bass gain bound: frame context -> (intensity, color)
+FrameKernel = Callable[[FrameContext], tuple[np.ndarray, np.ndarray]]
 
 
 def _base_color() -> tuple[float, float, float]:
@@ -53,7 +148,7 @@ def _base_color() -> tuple[float, float, float]:
 
 class PatternEngine:
     """
-    Generates LightState for each light based on pattern and audio.
+    Generates the light states array for each frame based on pattern and audio.
     """
 
     # Default zone mix sets: cycle these so top/sides do different things
@@ -64,6 +159,12 @@ class PatternEngine:
         {"top": "music_color", "left": "left_right_alt", "right": "left_right_alt", "front": "chase", "back": "right_off", "bottom": "center_out"},
     ]
 
+    # Onset detection (BEAT_HUE): flux must exceed this multiple of the median recent flux
+    BEAT_FLUX_RATIO = 1.6
+    BEAT_MIN_FLUX = 0.2  # absolute floor so noise in quiet passages doesn't trigger
+    BEAT_HISTORY_FRAMES = 43  # median window in bands readings, ~2 s of 2048-sample chunks at 44.1 kHz
+    BEAT_PEAK_FRAMES = 5  # flux must be at least the max of this many previous readings
+
     def __init__(
         self,
         layout: LightLayout,
@@ -82,145 +183,159 @@ class PatternEngine:
         self.zone_mix_sets = zone_mix_sets or self.DEFAULT_ZONE_MIX_SETS
         self.zone_cycle_seconds = zone_cycle_seconds
         self._start_time = time.perf_counter()
-        # Beat detection state
-        self._prev_bass = 0.0
+        # Seconds since start, sampled once at the top of each compute() so every
+        # animation in a frame (phase, hue drift, breathing, rotation, beats) agrees
+        self._t = 0.0
+        # Per-light layout arrays (struct-of-arrays) for the vectorized pattern kernels
+        # Light count is fixed for the engine's lifetime (the arrays below are sized to it)
+        self._n = n = layout.total_lights()
+        arrays = layout.arrays()
+        # Positions stay float64 so chase/center-out edges match the scalar math.
+        self._global_idx = np.arange(n, dtype=np.float64)
+        self._zone_id = arrays.zone_ids
+        self._zone_index = arrays.zone_indices.astype(np.float64)
+        self._zone_count = arrays.zone_counts.astype(np.float64)
+        # Front-to-back wave position per light: zone order front -> left/right -> back
+        wave_zone_order = [Zone.FRONT, Zone.LEFT, Zone.RIGHT, Zone.BACK, Zone.TOP, Zone.BOTTOM]
+        zone_phase = np.array(
+            [wave_zone_order.index(zone) / len(wave_zone_order) for zone in ZONE_ORDER]
+        )[self._zone_id]
+        within_zone = self._zone_index / np.maximum(1, self._zone_count)
+        self._wave_pos = (zone_phase * 0.5 + within_zone * 0.5) % 1.0
+        # Left/right membership for left_right_alt (-1 left, 1 right, 0 other)
+        self._side = np.zeros(n, dtype=np.int8)
+        self._side[self._zone_id == Zone.LEFT.id] = -1
+        self._side[self._zone_id == Zone.RIGHT.id] = 1
+        # Layout-only geometry for center_out / left_right_alt: zone center, each
+        # light's distance from it, and which half of its zone the light is in
+        self._center = (self._zone_count - 1) / 2.0
+        self._center_dist = np.abs(self._zone_index - self._center)
+        self._first_half = self._zone_index < self._zone_count / 2
+        # Static on/off masks
+        self._left_off = np.where(self._side < 0, 0.0, 1.0)
+        self._right_off = np.where(self._side > 0, 0.0, 1.0)
+        self._left_off.flags.writeable = False
+        self._right_off.flags.writeable = False
+        # Intensity output the pattern kernels write into (overwritten by each kernel call)
+        self._intensity = np.zeros(n)
+        # Per-light hue offset so adjacent lights vary (rainbow spread)
+        self._light_hue_offsets = np.arange(n, dtype=np.float32) / max(n, 1) * 0.2
+        # Frame output reused every compute()
+        self._states_buf = np.zeros((n, STATE_COLUMNS), dtype=np.float32)
+        # Beat detection state: recent spectral flux values, one per new bands reading
+        self._prev_levels = np.zeros(3, dtype=np.float32)
+        self._flux_history: deque[float] = deque(maxlen=self.BEAT_HISTORY_FRAMES)
+        self._beat_bands: FrequencyBands | None = None  # bands _detect_beat last ran on
         self._beat_hue = 0.0
         self._last_beat_time = 0.0
         self._beat_cooldown = 0.15  # min seconds between beats
+        self._pattern_kernels = self._build_pattern_kernels()
+        self._frame_kernels = {p: self._specialize(p) for p in Pattern}
+        self._frame_pattern: Pattern | None = None
+        self._frame_kernel: FrameKernel | None = None
+        self._zone_mix_plan = self._build_zone_mix_plan()
 
     def _detect_beat(self, bands: FrequencyBands | None) -> bool:
-        """Return True if a beat (bass/upper_bass spike) was detected this frame."""
-        if not bands:
+        """
+        Return True if an onset (beat) was detected this frame.
+        Spectral flux over upper bass / mid / high (sum of per-band rises) against an
+        adaptive threshold: BEAT_FLUX_RATIO x the median flux of the recent history,
+        and a local peak over the last few readings, plus a cooldown from the last detection.
+        Only new bands count: frames that reuse the previous FFT (audio chunks arrive
+        slower than frames) or run beat_hue in a second zone_mix zone are skipped, so
+        they don't push zero flux into the history.
+        """
+        if not bands or bands is self._beat_bands:
             return False
-        bass = getattr(bands, "upper_bass", bands.low)
-        t = time.perf_counter() - self._start_time
-        # Beat = sharp rise and we're past cooldown
-        rise = bass - self._prev_bass
-        self._prev_bass = bass
-        if rise > 0.25 and (t - self._last_beat_time) >= self._beat_cooldown and bass > 0.3:
-            self._last_beat_time = t
-            return True
-        return False
+        self._beat_bands = bands
+        levels = bands.values[1:4]  # upper_bass, mid, high
+        flux = float(np.maximum(levels - self._prev_levels, 0.0).sum())
+        self._prev_levels = levels.copy()
+        history = self._flux_history
+        t = self._t
+        is_beat = False
+        if len(history) >= self.BEAT_PEAK_FRAMES:
+            recent = list(history)[-self.BEAT_PEAK_FRAMES:]
+            threshold = max(self.BEAT_MIN_FLUX, self.BEAT_FLUX_RATIO * float(np.median(history)))
+            if flux > threshold and flux >= max(recent) and (t - self._last_beat_time) >= self._beat_cooldown:
+                self._last_beat_time = t
+                is_beat = True
+        history.append(flux)
+        return is_beat
 
     def _phase(self, speed: float = 1.0) -> float:
-        """Oscillating phase 0-1 based on time."""
-        t = time.perf_counter() - self._start_time
-        phase = (t * speed) % 1.0
-        return phase
+        """Oscillating phase 0-1 based on the frame time."""
+        return (self._t * speed) % 1.0
 
     def _chase_intensity(
-        self, ld: LightDescriptor, phase: float, tail_len: int, reverse: bool = False
-    ) -> float:
+        self, phase: float, tail_len: int, reverse: bool = False, gain: float = 1.0
+    ) -> np.ndarray:
         """
         Chase pattern: one lit "head" moves, with a tail of dimming lights.
         tail_len = number of lights in the tail (e.g. 2-3).
         """
-        n = self.layout.total_lights()
-        if n == 0:
-            return 0.0
+        n = self._n
         if reverse:
             phase = 1.0 - phase
-        head_pos = phase * n
-        dist = (ld.global_index - head_pos + n) % n
-        if dist <= tail_len:
-            return 1.0 - (dist / (tail_len + 1))
-        return 0.0
+        _chase_kernel(self._global_idx, phase * n, n, tail_len, gain, self._intensity)
+        return self._intensity
 
     def _front_to_back_intensity(
-        self, ld: LightDescriptor, phase: float, reverse: bool = False
-    ) -> float:
+        self, phase: float, reverse: bool = False, gain: float = 1.0
+    ) -> np.ndarray:
         """
         Front-to-back wave: front lights light first, then back.
         Uses zones: front -> left/right -> back. Top/bottom follow their row.
         """
         if reverse:
             phase = 1.0 - phase
-        zone_order = [Zone.FRONT, Zone.LEFT, Zone.RIGHT, Zone.BACK, Zone.TOP, Zone.BOTTOM]
-        try:
-            zone_phase = zone_order.index(ld.zone) / len(zone_order)
-        except ValueError:
-            zone_phase = 0
-        within_zone = ld.zone_index / max(1, ld.zone_count)
-        wave_pos = (zone_phase * 0.5 + within_zone * 0.5) % 1.0
-        dist = abs(wave_pos - phase)
-        if dist > 0.5:
-            dist = 1.0 - dist
-        return max(0, 1.0 - dist * 3)
-
-    def _left_off_intensity(self, ld: LightDescriptor) -> float:
+        _front_to_back_kernel(self._wave_pos, phase, gain, self._intensity)
+        return self._intensity
+
+    def _left_off_intensity(self) -> np.ndarray:
         """Left lights off, right lights on."""
-        if ld.zone == Zone.LEFT:
-            return 0.0
-        return 1.0
+        return self._left_off
 
-    def _right_off_intensity(self, ld: LightDescriptor) -> float:
+    def _right_off_intensity(self) -> np.ndarray:
         """Right lights off, left lights on."""
-        if ld.zone == Zone.RIGHT:
-            return 0.0
-        return 1.0
+        return self._right_off
 
-    def _left_right_alt_intensity(
-        self, ld: LightDescriptor, phase: float, bands: FrequencyBands | None
-    ) -> float:
+    def _left_right_alt_intensity(self, ctx: FrameContext) -> np.ndarray:
         """
         Left and right zones alternate: left on when phase 0-0.5, right on 0.5-1.
         Front/back/top/bottom pulse with overall or split (left half vs right half by zone).
         """
-        if ld.zone == Zone.LEFT:
-            return 1.0 if phase < 0.5 else 0.0
-        if ld.zone == Zone.RIGHT:
-            return 0.0 if phase < 0.5 else 1.0
-        # Front/back/top/bottom: left half of zone = left phase, right half = right phase
-        mid = ld.zone_count / 2
-        on_left_phase = phase < 0.5
-        on_right_phase = phase >= 0.5
-        if ld.zone_index < mid:
-            base = 1.0 if on_left_phase else 0.0
-        else:
-            base = 1.0 if on_right_phase else 0.0
-        if bands:
-            base *= 0.4 + 0.6 * bands.overall
-        return base
-
-    def _center_out_intensity(
-        self, ld: LightDescriptor, phase: float, bands: FrequencyBands | None
-    ) -> float:
+        left_on = 1.0 if ctx.phase < 0.5 else 0.0
+        level = 0.4 + 0.6 * ctx.overall if ctx.bands else 1.0
+        _left_right_alt_kernel(
+            self._side, self._first_half, left_on, level, self._intensity
+        )
+        return self._intensity
+
+    def _center_out_intensity(self, ctx: FrameContext) -> np.ndarray:
         """
         Within each zone: middle 2 lights on first, expand outward by 1 each side.
         Phase 0 = center 2; phase 0.2 = middle 4; ... phase 1 = full zone.
         """
-        if ld.zone_count <= 0:
-            return 0.0
-        center = (ld.zone_count - 1) / 2.0
-        dist_from_center = abs(ld.zone_index - center)
-        max_radius = center + 0.5  # full zone
-        min_radius = 0.5  # middle 2 lights
-        if bands:
-            phase = (phase * 0.7 + 0.3 * getattr(bands, "upper_bass", bands.low)) % 1.0
-        lit_radius = min_radius + phase * (max_radius - min_radius)
-        if dist_from_center <= lit_radius:
-            return max(0.0, 1.0 - (dist_from_center / max(lit_radius, 0.01)) * 0.3)
-        return 0.0
-
-    def _swirl_intensity(
-        self, ld: LightDescriptor, phase: float, tail_len: int, bands: FrequencyBands | None
-    ) -> float:
+        phase = ctx.phase
+        if ctx.bands:
+            phase = (phase * 0.7 + 0.3 * ctx.upper_bass) % 1.0
+        _center_out_kernel(self._center_dist, self._center, phase, self._intensity)
+        return self._intensity
+
+    def _swirl_intensity(self, ctx: FrameContext, tail_len: int, gain: float = 1.0) -> np.ndarray:
         """
         Swirl: circular rotating chase. All lights treated as a ring.
         Speed can be boosted by upper bass for a vortex feel.
         """
-        n = self.layout.total_lights()
-        if n == 0:
-            return 0.0
+        n = self._n
+        phase = ctx.phase
         # Modulate phase speed with upper bass (or low) for reactive swirl
-        if bands:
-            speed_boost = 0.7 + 0.6 * getattr(bands, "upper_bass", bands.low)
+        if ctx.bands:
+            speed_boost = 0.7 + 0.6 * ctx.upper_bass
             phase = (phase * speed_boost) % 1.0
-        head_pos = phase * n
-        dist = (ld.global_index - head_pos + n) % n
-        if dist <= tail_len:
-            return 1.0 - (dist / (tail_len + 1))
-        return 0.0
+        _chase_kernel(self._global_idx, phase * n, n, tail_len, gain, self._intensity)
+        return self._intensity
 
     def _breathing_state(
         self, base_color: tuple[float, float, float], breath_rate: float = 0.35
@@ -229,7 +344,7 @@ class PatternEngine:
         Breathing: lock to base color, subtle hue shift, intensity pulses.
         Returns (color, intensity) for all lights (same).
         """
-        t = time.perf_counter() - self._start_time
+        t = self._t
         # Soft sine for intensity (breath in/out)
         breath = 0.4 + 0.6 * (0.5 + 0.5 * math.sin(t * 2 * math.pi * breath_rate))
         # Hue drifts slowly through full spectrum (not stuck in red/orange)
@@ -243,130 +358,163 @@ class PatternEngine:
         """Current Y rotation in radians, or None if rotation disabled."""
         if not self.rotation_enabled:
             return None
-        t = time.perf_counter() - self._start_time
+        t = self._t
         deg_per_sec = self.rotation_speed
         if self.rotation_audio_boost and bands:
             deg_per_sec *= 0.7 + 0.6 * bands.low
         angle_deg = (t * deg_per_sec) % 360
         return math.radians(angle_deg)
 
+    def _build_pattern_kernels(self) -> dict[Pattern, PatternKernel]:
+        """
+        One kernel per pattern, chosen once per frame instead of walking an
+        if/elif chain. Each returns (intensity, color) for every light, with the
+        bass boost gain already applied to intensity.
+        """
+        def flat(level: float, gain: float = 1.0) -> np.ndarray:
+            self._intensity.fill(min(1.0, level * gain))
+            return self._intensity
+
+        def beat_hue(ctx: FrameContext, gain: float):
+            if self._detect_beat(ctx.bands):
+                self._beat_hue = (self._beat_hue + 0.2) % 1.0
+            color = energy_to_color_lut(0.9, self._beat_hue + self._light_hue_offsets * 0.5)
+            return flat(0.3 + 0.7 * ctx.low), color
+
+        # Kernels for NO_BASS_BOOST patterns always get gain 1.0 and ignore it
+        return {
+            Pattern.CHASE: lambda ctx, gain: (
+                self._chase_intensity(ctx.phase, self.chase_tail, False, gain), ctx.colors),
+            Pattern.CHASE_REVERSE: lambda ctx, gain: (
+                self._chase_intensity(ctx.phase, self.chase_tail, True, gain), ctx.colors),
+            Pattern.FRONT_TO_BACK: lambda ctx, gain: (
+                self._front_to_back_intensity(ctx.phase, False, gain), ctx.colors),
+            Pattern.BACK_TO_FRONT: lambda ctx, gain: (
+                self._front_to_back_intensity(ctx.phase, True, gain), ctx.colors),
+            Pattern.LEFT_OFF: lambda ctx, gain: (self._left_off_intensity(), ctx.colors),
+            Pattern.RIGHT_OFF: lambda ctx, gain: (self._right_off_intensity(), ctx.colors),
+            Pattern.LEFT_RIGHT_ALT: lambda ctx, gain: (self._left_right_alt_intensity(ctx), ctx.colors),
+            Pattern.CENTER_OUT: lambda ctx, gain: (self._center_out_intensity(ctx), ctx.colors),
+            Pattern.SWIRL: lambda ctx, gain: (
+                self._swirl_intensity(ctx, self.chase_tail, gain), ctx.colors),
+            Pattern.UPPER_BASS: lambda ctx, gain: (flat(0.3 + 0.7 * ctx.upper_bass), ctx.colors),
+            Pattern.BASS_FLOOD: lambda ctx, gain: (flat(0.2 + 0.8 * ctx.low), ctx.colors),
+            Pattern.TREBLE_HUE: lambda ctx, gain: (
+                flat(0.5 + 0.5 * ctx.overall, gain),
+                energy_to_color_lut(1.0, ctx.pattern_hue + self._light_hue_offsets),
+            ),
+            Pattern.BAND_SPLIT: lambda ctx, gain: (
+                flat(0.3 + 0.7 * ctx.low),
+                energy_to_color_lut(0.8, ctx.pattern_hue + self._light_hue_offsets),
+            ),
+            Pattern.MUSIC_COLOR: lambda ctx, gain: (flat(0.5 + 0.5 * ctx.overall, gain), ctx.colors),
+            Pattern.ALL_ON: lambda ctx, gain: (flat(1.0, gain), ctx.colors),
+            Pattern.BEAT_HUE: beat_hue,
+            # BREATHING / ZONE_MIX inside a zone set: light stays off
+            Pattern.BREATHING: lambda ctx, gain: (flat(0.0), ctx.colors),
+            Pattern.ZONE_MIX: lambda ctx, gain: (flat(0.0), ctx.colors),
+        }
+
+    def _build_zone_mix_plan(self) -> list[list[tuple[np.ndarray, FrameKernel]]]:
+        """
+        Resolve each zone mix set once to (light mask, frame kernel) pairs for the
+        non-empty zones, so frames don't parse pattern names or rebuild masks.
+        Unknown names fall back to bass_flood.
+        """
+        plan = []
+        for zone_set in self.zone_mix_sets:
+            entries = []
+            for zone in ZONE_ORDER:
+                mask = self._zone_id == zone.id
+                if not mask.any():
+                    continue
+                try:
+                    p = Pattern(zone_set.get(zone.value, "bass_flood"))
+                except ValueError:
+                    p = Pattern.BASS_FLOOD
+                entries.append((mask, self._frame_kernels[p]))
+            plan.append(entries)
+        return plan
+
+    def _specialize(self, p: Pattern) -> FrameKernel:
+        """
+        Frame function for pattern p with its kernel and bass-boost choice bound
+        in, so a frame runs it without table lookups or NO_BASS_BOOST checks.
+        Returns (intensity (n,), color (n, 3)); patterns that don't set their own
+        color return ctx.colors as-is.
+        """
+        kernel = self._pattern_kernels[p]
+        if p in NO_BASS_BOOST:
+            return lambda ctx: kernel(ctx, 1.0)
+        # Boost intensity with bass (applied inside the kernel)
+        return lambda ctx: kernel(ctx, ctx.bass_gain)
+
     def compute(
         self,
         pattern: Pattern,
         bands: FrequencyBands | None,
-    ) -> list[LightState]:
+    ) -> np.ndarray:
         """
-        Compute LightState for each light.
+        Compute the (n, 5) states array (see STATE_COLUMNS) for all lights.
         bands can be None for patterns that don't use audio.
+        Each pattern is evaluated for all lights at once on NumPy arrays.
+        The returned array is a buffer reused (overwritten) by the next call.
         """
+        self._t = t = time.perf_counter() - self._start_time
         phase = self._phase()
-        states: list[LightState] = []
-        n = self.layout.total_lights()
+        n = self._n
 
         if n == 0:
-            return []
+            return self._states_buf
+
+        # Band levels read once per frame (FrequencyBands always carries upper_bass)
+        if bands:
+            low, upper_bass, mid, _, overall = bands.values.tolist()
+            bass_gain = 0.7 + 0.3 * low
+        else:
+            low = upper_bass = overall = 0.5
+            mid = 0.6
+            bass_gain = 1.0
 
         # Music-reactive color - spread across full spectrum (not just red/orange)
-        t = time.perf_counter() - self._start_time
         time_hue = (t * 0.08) % 1.0  # slow drift through spectrum
+        band_hue = time_hue
         if bands:
             band_hue = bands_to_hue(bands)  # low=red, mid=green, high=blue
             base_hue = (band_hue * 0.6 + time_hue * 0.4) % 1.0
-            music_color = energy_to_color(bands.mid, base_hue)
         else:
             base_hue = time_hue
-            music_color = energy_to_color(0.6, base_hue)
 
         rotation_y = self._rotation_y(bands)
 
+        buf = self._states_buf
         # Breathing: compute once, same for all lights
         if pattern == Pattern.BREATHING:
+            music_color = energy_to_color(mid, base_hue)
             breath_color, breath_intensity = self._breathing_state(music_color)
-            return [
-                LightState(
-                    r=breath_color[0], g=breath_color[1], b=breath_color[2],
-                    intensity=breath_intensity, rotation_y=rotation_y,
-                )
-                for _ in self.layout.iter_lights()
-            ]
-
-        # ZONE_MIX: different pattern per zone, cycling sets over time
+            buf[:, :3] = breath_color
+            buf[:, STATE_INTENSITY] = breath_intensity
+            buf[:, STATE_ROTATION_Y] = np.nan if rotation_y is None else rotation_y
+            return buf
+
+        # Default color for every light: one hue-table lookup per light
+        light_colors = energy_to_color_lut(mid, base_hue + self._light_hue_offsets)
+        ctx = FrameContext(phase, bands, light_colors, band_hue, bass_gain, low, upper_bass, overall)
+
         if pattern == Pattern.ZONE_MIX:
-            t = time.perf_counter() - self._start_time
+            # Different pattern per zone, cycling sets over time
             set_idx = int(t / self.zone_cycle_seconds) % max(1, len(self.zone_mix_sets))
-            zone_set = self.zone_mix_sets[set_idx]
-
-        for ld in self.layout.iter_lights():
-            intensity = 0.0
-            # Per-light hue offset so adjacent lights vary (rainbow spread)
-            light_hue_offset = (ld.global_index / max(n, 1)) * 0.2
-            base_hue_adj = (base_hue + light_hue_offset) % 1.0
-            color = energy_to_color(bands.mid if bands else 0.6, base_hue_adj)
-
-            # For ZONE_MIX, use zone's pattern from current set
-            p = pattern
-            if pattern == Pattern.ZONE_MIX:
-                zone_pattern_str = zone_set.get(ld.zone.value, "bass_flood")
-                try:
-                    p = Pattern(zone_pattern_str)
-                except ValueError:
-                    p = Pattern.BASS_FLOOD
-
-            if p == Pattern.CHASE:
-                intensity = self._chase_intensity(ld, phase, self.chase_tail, False)
-            elif p == Pattern.CHASE_REVERSE:
-                intensity = self._chase_intensity(ld, phase, self.chase_tail, True)
-            elif p == Pattern.FRONT_TO_BACK:
-                intensity = self._front_to_back_intensity(ld, phase, False)
-            elif p == Pattern.BACK_TO_FRONT:
-                intensity = self._front_to_back_intensity(ld, phase, True)
-            elif p == Pattern.LEFT_OFF:
-                intensity = self._left_off_intensity(ld)
-            elif p == Pattern.RIGHT_OFF:
-                intensity = self._right_off_intensity(ld)
-            elif p == Pattern.LEFT_RIGHT_ALT:
-                intensity = self._left_right_alt_intensity(ld, phase, bands)
-            elif p == Pattern.CENTER_OUT:
-                intensity = self._center_out_intensity(ld, phase, bands)
-            elif p == Pattern.SWIRL:
-                intensity = self._swirl_intensity(ld, phase, self.chase_tail, bands)
-            elif p == Pattern.UPPER_BASS:
-                intensity = 0.3 + 0.7 * (getattr(bands, "upper_bass", bands.low) if bands else 0.5)
-            elif p == Pattern.BASS_FLOOD:
-                intensity = 0.2 + 0.8 * (bands.low if bands else 0.5)
-            elif p == Pattern.TREBLE_HUE:
-                hue = bands_to_hue(bands) if bands else time_hue
-                color = energy_to_color(1.0, (hue + light_hue_offset) % 1.0)
-                intensity = 0.5 + 0.5 * (bands.overall if bands else 0.5)
-            elif p == Pattern.BAND_SPLIT:
-                intensity = 0.3 + 0.7 * (bands.low if bands else 0.5)
-                hue = bands_to_hue(bands) if bands else time_hue
-                color = energy_to_color(0.8, (hue + light_hue_offset) % 1.0)
-            elif p == Pattern.MUSIC_COLOR:
-                intensity = 0.5 + 0.5 * (bands.overall if bands else 0.5)
-            elif p == Pattern.ALL_ON:
-                intensity = 1.0
-            elif p == Pattern.BEAT_HUE:
-                beat = self._detect_beat(bands)
-                if beat:
-                    self._beat_hue = (self._beat_hue + 0.2) % 1.0
-                hue = (self._beat_hue + light_hue_offset * 0.5) % 1.0
-                color = energy_to_color(0.9, hue)
-                intensity = 0.3 + 0.7 * (getattr(bands, "low", 0.5) if bands else 0.5)
-
-            # Boost intensity with bass for most patterns
-            no_bass_boost = (Pattern.LEFT_OFF, Pattern.RIGHT_OFF, Pattern.LEFT_RIGHT_ALT, Pattern.CENTER_OUT, Pattern.UPPER_BASS, Pattern.BASS_FLOOD, Pattern.BAND_SPLIT, Pattern.BEAT_HUE)
-            if bands and p not in no_bass_boost:
-                intensity = min(1.0, intensity * (0.7 + 0.3 * bands.low))
-
-            states.append(
-                LightState(
-                    r=color[0],
-                    g=color[1],
-                    b=color[2],
-                    intensity=intensity,
-                    rotation_y=rotation_y,
-                )
-            )
-
-        return states
+            for mask, frame_kernel in self._zone_mix_plan[set_idx]:
+                zone_intensity, zone_color = frame_kernel(ctx)
+                buf[mask, STATE_INTENSITY] = zone_intensity[mask]
+                buf[mask, :3] = zone_color[mask]
+        else:
+            if pattern is not self._frame_pattern:
+                # Pattern changed: look up its frame kernel once, not every frame
+                self._frame_pattern, self._frame_kernel = pattern, self._frame_kernels[pattern]
+            intensity, color = self._frame_kernel(ctx)
+            np.copyto(buf[:, :3], color)
+            np.copyto(buf[:, STATE_INTENSITY], intensity, casting="same_kind")
+
+        buf[:, STATE_ROTATION_Y] = np.nan if rotation_y is None else rotation_y
+        return buf
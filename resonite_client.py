@@ -1,20 +1,45 @@
 """ResoniteLink WebSocket client: create and update lights in Resonite."""
 
 import asyncio
+import contextlib
+import itertools
 import logging
-import math
 import json
 import uuid
 from typing import Any
 
+import numpy as np
 import websockets
 from websockets.client import WebSocketClientProtocol
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
 
-from light_layout import LightLayout, LightDescriptor, Zone
-from pattern_engine import LightState
+from light_layout import ZONE_ORDER, LightLayout, LightDescriptor, Zone
+from pattern_engine import STATE_ROTATION_Y
+
+try:
+    # Optional: orjson encodes/decodes several times faster than the stdlib json module
+    import orjson
+
+    def _dumps(msg: dict) -> str:
+        # Decode to str so messages still go out as text frames
+        return orjson.dumps(msg).decode()
+
+    _loads = orjson.loads
+except ImportError:
+
+    def _dumps(msg: dict) -> str:
+        # Compact separators: no spaces on the wire, same as orjson
+        return json.dumps(msg, separators=(",", ":"))
+
+    _loads = json.loads
 
 logger = logging.getLogger(__name__)
 ID_PREFIX = "RALC_"
+# 8-bit level -> JSON number sent on the wire (color channel, and Intensity which is doubled).
+# 4 decimals is well inside half a level (1/510), so each still decodes to the same level,
+# at about a third of the bytes of full float repr.
+_LEVEL_JSON = [_dumps(round(level / 255.0, 4)) for level in range(256)]
+_INTENSITY_JSON = [_dumps(round(level / 255.0 * 2.0, 4)) for level in range(256)]
 # FrooxEngine.Light handles Point/Spot/Directional via LightType enum
 LIGHT_COMPONENT = "[FrooxEngine]FrooxEngine.Light"
 # LightType enum values for addComponent: Point, Spot, Directional
@@ -27,6 +52,26 @@ MESH_RENDERER = "[FrooxEngine]FrooxEngine.MeshRenderer"
 SPHERE_RADIUS = 0.1
 SPHERE_SEGMENTS = 4
 SPHERE_RINGS = 2
+# Zone base positions (approximate room layout) and the axis each zone's lights
+# spread along (left/right walls go up in y, the rest across in x), in ZONE_ORDER
+_ZONE_BASE_POSITIONS = np.array([
+    {
+        Zone.LEFT: (-3, 1.5, 0),
+        Zone.RIGHT: (3, 1.5, 0),
+        Zone.FRONT: (0, 1.5, 3),
+        Zone.BACK: (0, 1.5, -3),
+        Zone.TOP: (0, 4, 0),
+        Zone.BOTTOM: (0, -0.5, 0),
+    }[zone]
+    for zone in ZONE_ORDER
+], dtype=np.float64)
+_ZONE_SPREAD_AXIS = np.array(
+    [1 if zone in (Zone.LEFT, Zone.RIGHT) else 0 for zone in ZONE_ORDER], dtype=np.intp
+)
+# update_lights awaits responses every this many sends, else doesn't wait for them
+SYNC_EVERY_UPDATES = 60
+# Lights whose setup messages are pipelined together in setup_lights
+SETUP_BATCH_LIGHTS = 16
 
 
 def _ref(target_id: str) -> dict:
@@ -68,15 +113,43 @@ def _enum_val(enum_type: str, value: str) -> dict:
     return {"$type": "enum", "value": value, "enumType": enum_type}
 
 
-def _floatQ(x: float, y: float, z: float, w: float) -> dict:
-    """Quaternion for slot rotation."""
-    return {"$type": "floatQ", "value": {"x": x, "y": y, "z": z, "w": w}}
+# Setup values identical for every light, built once (the encoder only reads them)
+_SCALE_ONE = _float3(1, 1, 1)
+_LIGHT_TYPE_POINT = _enum_val("LightType", LIGHT_TYPE_POINT)
+_LIGHT_COLOR = _color(1, 0.5, 0.2)
+_LIGHT_INTENSITY = _float_val(1.0)
+_LIGHT_RANGE = _float_val(10.0)
+_SPHERE_MEMBERS = {
+    "Radius": _float_val(SPHERE_RADIUS),
+    "Segments": _int_val(SPHERE_SEGMENTS),
+    "Rings": _int_val(SPHERE_RINGS),
+}
+_BULB_MEMBERS = {"AlbedoColor": _color(1.0, 0.5, 0.2)}
+
+
+def _color_update_template(comp_id: str) -> str:
+    """
+    Pre-serialized updateComponent for one light's Color and Intensity, so frames
+    skip building and encoding dicts. %-slots: messageId, r, g, b, intensity (JSON numbers).
+    """
+    return (
+        '{"$type":"updateComponent","messageId":"%s","data":{"id":' + _dumps(comp_id)
+        + ',"members":{"Color":{"$type":"colorX","value":{"r":%s,"g":%s,"b":%s,"a":1.0}},'
+        '"Intensity":{"$type":"float","value":%s}}}}'
+    )
 
 
-def euler_y_to_quat(angle_rad: float) -> dict:
-    """Rotation around Y axis (up) - angle in radians."""
-    half = angle_rad / 2
-    return _floatQ(0, math.sin(half), 0, math.cos(half))
+def _rotation_update_template(slot_id: str) -> str:
+    """Pre-serialized updateSlot rotation about Y. %-slots: messageId, quaternion y, w."""
+    return (
+        '{"$type":"updateSlot","messageId":"%s","data":{"id":' + _dumps(slot_id)
+        + ',"rotation":{"$type":"floatQ","value":{"x":0,"y":%r,"z":0,"w":%r}}}}'
+    )
+
+
+def quantize_levels(values: np.ndarray) -> np.ndarray:
+    """Clamp 0-1 floats and round to uint8 levels (0-255), the precision lights are sent at."""
+    return np.rint(np.clip(values, 0.0, 1.0) * 255.0).astype(np.uint8)
 
 
 class ResoniteClient:
@@ -85,38 +158,185 @@ class ResoniteClient:
     Creates lights in zones and updates them with pattern output.
     """
 
-    def __init__(self, url: str = "ws://localhost:27404/ResoniteLink"):
+    def __init__(self, url: str = "ws://localhost:27404/ResoniteLink", compression: bool = True):
         self.url = url
+        # Offer permessage-deflate (used only if ResoniteLink accepts it)
+        self.compression = compression
         self._ws: WebSocketClientProtocol | None = None
         self._layout: LightLayout | None = None
         self._slot_ids: list[str] = []
         self._component_ids: list[str] = []
+        # Per-light pre-serialized update messages (see _color_update_template)
+        self._color_templates: list[str] = []
+        self._rotation_templates: list[str] = []
         self._root_slot_id: str = ""
-        self._send_lock = asyncio.Lock()
+        # In-flight requests by messageId; the reader task resolves them from responses.
+        # None marks a fire-and-forget update, whose response is only checked for errors.
+        self._pending: dict[str, asyncio.Future | None] = {}
+        # update_lights sends since the last synced one
+        self._updates_since_sync = 0
+        self._message_ids = itertools.count()
+        self._reader_task: asyncio.Task | None = None
+        # Last 8-bit (r, g, b, intensity) levels and rotations sent per light, for diffing
+        self._last_levels: np.ndarray | None = None
+        self._last_rotation: np.ndarray | None = None
 
     async def connect(self) -> None:
+        extensions = None
+        if self.compression:
+            # Full 32 KB windows both ways so keys repeated across messages compress
+            # to back-references; memLevel 8 (zlib default) trades a little memory for speed
+            extensions = [
+                ClientPerMessageDeflateFactory(
+                    client_max_window_bits=15,
+                    compress_settings={"memLevel": 8},
+                )
+            ]
         self._ws = await websockets.connect(
             self.url,
+            compression=None,
+            extensions=extensions,
             ping_interval=20,
             ping_timeout=10,
             close_timeout=5,
         )
+        self._reader_task = asyncio.create_task(self._reader_loop(self._ws))
 
     async def disconnect(self) -> None:
         if self._ws:
             await self._ws.close()
             self._ws = None
+        if self._reader_task:
+            self._reader_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._reader_task
+            self._reader_task = None
+
+    async def _reader_loop(self, ws: WebSocketClientProtocol) -> None:
+        """
+        Hand each response to the request it answers, matched on sourceMessageId.
+        Responses without that key go to the oldest pending request (ResoniteLink answers
+        in order); responses naming an unknown id are logged and dropped.
+        """
+        error: BaseException = ConnectionError("ResoniteLink connection closed")
+        try:
+            async for frame in ws:
+                try:
+                    resp = _loads(frame)
+                except ValueError:
+                    logger.warning("Ignoring malformed ResoniteLink message: %.200r", frame)
+                    continue
+                if not isinstance(resp, dict):
+                    logger.warning("Ignoring unexpected ResoniteLink message: %.200r", frame)
+                    continue
+                if "sourceMessageId" in resp:
+                    source_id = resp["sourceMessageId"]
+                    if source_id not in self._pending:
+                        # Late reply to a timed-out or dropped request: matching it to
+                        # some other request would shift every later match
+                        logger.warning("Dropping response to unknown message %r", source_id)
+                        continue
+                    fut = self._pending.pop(source_id)
+                elif self._pending:
+                    source_id = next(iter(self._pending))
+                    fut = self._pending.pop(source_id)
+                else:
+                    continue
+                if fut is None:
+                    err = resp.get("errorInfo")
+                    if err:
+                        logger.warning("Light update %s failed: %s", source_id, err)
+                elif not fut.done():
+                    fut.set_result(resp)
+        except websockets.ConnectionClosed as e:
+            error = e
+        finally:
+            # Fail in-flight requests now instead of letting each wait out its timeout
+            for fut in self._pending.values():
+                if fut is not None and not fut.done():
+                    fut.set_exception(error)
+            self._pending.clear()
+
+    def _next_message_id(self) -> str:
+        return f"{ID_PREFIX}Msg_{next(self._message_ids)}"
 
     async def _send(self, msg: dict) -> dict | None:
+        return (await self._send_many([msg]))[0]
+
+    async def _send_many(self, msgs: list[dict]) -> list[dict | None]:
+        """Tag each message with a fresh messageId, encode, and send as one pipelined batch."""
+        message_ids = []
+        payloads = []
+        for msg in msgs:
+            msg["messageId"] = message_id = self._next_message_id()
+            message_ids.append(message_id)
+            payloads.append(_dumps(msg))
+        return await self._send_payloads(message_ids, payloads)
+
+    async def _send_payloads(
+        self, message_ids: list[str], payloads: list[str]
+    ) -> list[dict | None]:
+        """
+        Send encoded messages back to back, then wait for all their responses (None on timeout).
+        ResoniteLink has no batch op, so a frame is pipelined instead: one round
+        trip of latency per batch rather than per message. Concurrent callers
+        interleave freely; the reader task routes each response by messageId.
+        """
         if not self._ws:
             raise RuntimeError("Not connected")
-        async with self._send_lock:
-            await self._ws.send(json.dumps(msg))
-            try:
-                resp = await asyncio.wait_for(self._ws.recv(), timeout=5.0)
-                return json.loads(resp)
-            except asyncio.TimeoutError:
-                return None
+        loop = asyncio.get_running_loop()
+        futs = []
+        for message_id in message_ids:
+            self._pending[message_id] = fut = loop.create_future()
+            futs.append(fut)
+        try:
+            for payload in payloads:
+                await self._ws.send(payload)
+            await asyncio.wait(futs, timeout=5.0)
+        finally:
+            for message_id in message_ids:
+                self._pending.pop(message_id, None)
+        responses: list[dict | None] = []
+        for fut in futs:
+            if not fut.done():
+                fut.cancel()
+                responses.append(None)
+            else:
+                responses.append(fut.result())  # re-raises connection loss
+        return responses
+
+    async def _send_payloads_nowait(self, message_ids: list[str], payloads: list[str]) -> None:
+        """Send encoded messages without waiting; the reader task logs any error responses."""
+        if not self._ws:
+            raise RuntimeError("Not connected")
+        for message_id in message_ids:
+            self._pending[message_id] = None
+        for payload in payloads:
+            await self._ws.send(payload)
+
+    async def _send_synced(self, message_ids: list[str], payloads: list[str]) -> bool:
+        """
+        Send and wait for the responses, so a slow or stalled server holds the caller back.
+        ResoniteLink answers in order, so fire-and-forget updates sent before these that
+        are still unanswered never will be: drop them. Returns False if any response timed out.
+        """
+        responses = await self._send_payloads(message_ids, payloads)
+        stale = [message_id for message_id, fut in self._pending.items() if fut is None]
+        for message_id in stale:
+            del self._pending[message_id]
+        if stale:
+            logger.warning("%d light updates got no response", len(stale))
+        return all(resp is not None for resp in responses)
+
+    async def _send_checked(self, batch: list[tuple[dict, str]]) -> None:
+        """Pipeline (message, error context) pairs, then check each response and clear batch."""
+        if not batch:
+            return
+        items = batch[:]
+        batch.clear()
+        responses = await self._send_many([msg for msg, _ in items])
+        for (msg, context), resp in zip(items, responses):
+            self._check_response(resp, msg["$type"], context)
 
     def _check_response(self, resp: dict | None, op: str, context: str = "") -> None:
         """Log and raise if response indicates error."""
@@ -143,7 +363,10 @@ class ResoniteClient:
         center_*: offset all positions (e.g. around DJ booth).
         """
         self._layout = layout
-        root_id = f"{ID_PREFIX}Root_{uuid.uuid4().hex[:8]}"
+        # One random tag per setup keeps ids unique across sessions; within a setup,
+        # kind + light index is already unique, so lights need no random ids of their own
+        tag = uuid.uuid4().hex[:8]
+        root_id = f"{ID_PREFIX}Root_{tag}"
         self._root_slot_id = root_id
         parent = _ref(parent_slot_id or "Root")
 
@@ -158,7 +381,7 @@ class ResoniteClient:
         self._check_response(r, "addSlot", root_id)
 
         # Add DynamicVariableSpace for tagging/organization
-        space_id = f"{ID_PREFIX}Space_{uuid.uuid4().hex[:8]}"
+        space_id = f"{ID_PREFIX}Space_{tag}"
         r = await self._send({
             "$type": "addComponent",
             "containerSlotId": root_id,
@@ -174,101 +397,84 @@ class ResoniteClient:
 
         self._slot_ids = []
         self._component_ids = []
-
-        # Zone positions (approximate room layout)
-        zone_positions: dict[Zone, tuple[float, float, float]] = {
-            Zone.LEFT: (-3, 1.5, 0),
-            Zone.RIGHT: (3, 1.5, 0),
-            Zone.FRONT: (0, 1.5, 3),
-            Zone.BACK: (0, 1.5, -3),
-            Zone.TOP: (0, 4, 0),
-            Zone.BOTTOM: (0, -0.5, 0),
-        }
-
+        self._color_templates = []
+        self._rotation_templates = []
+        self._last_levels = None
+
+        # All light positions up front: zone base position, spread along the zone's axis
+        arrays = layout.arrays()
+        positions = _ZONE_BASE_POSITIONS[arrays.zone_ids]
+        offsets = (arrays.zone_indices - arrays.zone_counts / 2) * 0.5
+        positions[np.arange(len(positions)), _ZONE_SPREAD_AXIS[arrays.zone_ids]] += offsets
+        positions += (center_x, center_y, center_z)
+
+        # Per-light setup messages are queued and pipelined SETUP_BATCH_LIGHTS lights at a time
+        batch: list[tuple[dict, str]] = []
+        root_ref = _ref(root_id)
         for ld in layout.iter_lights():
-            base_x, base_y, base_z = zone_positions.get(ld.zone, (0, 1.5, 0))
-            offset = (ld.zone_index - ld.zone_count / 2) * 0.5
-            if ld.zone in (Zone.LEFT, Zone.RIGHT):
-                x, y, z = base_x, base_y + offset, base_z
-            elif ld.zone in (Zone.FRONT, Zone.BACK):
-                x, y, z = base_x + offset, base_y, base_z
-            else:
-                x, y, z = base_x + offset, base_y, base_z
-            x += center_x
-            y += center_y
-            z += center_z
+            x, y, z = positions[ld.global_index].tolist()
 
-            slot_id = f"{ID_PREFIX}Light_{ld.global_index}_{uuid.uuid4().hex[:6]}"
-            comp_id = f"{ID_PREFIX}Comp_{ld.global_index}_{uuid.uuid4().hex[:6]}"
+            slot_id = f"{ID_PREFIX}Light_{ld.global_index}_{tag}"
+            comp_id = f"{ID_PREFIX}Comp_{ld.global_index}_{tag}"
 
-            r = await self._send({
+            batch.append(({
                 "$type": "addSlot",
                 "data": {
                     "id": slot_id,
-                    "parent": _ref(root_id),
+                    "parent": root_ref,
                     "name": _str_val(f"Light_{ld.zone.value}_{ld.zone_index}"),
                     "position": _float3(x, y, z),
-                    "scale": _float3(1, 1, 1),
+                    "scale": _SCALE_ONE,
                 },
-            })
-            self._check_response(r, "addSlot", slot_id)
+            }, slot_id))
 
-            r = await self._send({
+            batch.append(({
                 "$type": "addComponent",
                 "containerSlotId": slot_id,
                 "data": {
                     "id": comp_id,
                     "componentType": LIGHT_COMPONENT,
                     "members": {
-                        "LightType": _enum_val("LightType", LIGHT_TYPE_POINT),
-                        "Color": _color(1, 0.5, 0.2),
-                        "Intensity": _float_val(1.0),
-                        "Range": _float_val(10.0),
+                        "LightType": _LIGHT_TYPE_POINT,
+                        "Color": _LIGHT_COLOR,
+                        "Intensity": _LIGHT_INTENSITY,
+                        "Range": _LIGHT_RANGE,
                     },
                 },
-            })
-            self._check_response(r, "addComponent", comp_id)
+            }, comp_id))
 
             # Visual: small sphere so you can see where each light is
-            mesh_id = f"{ID_PREFIX}Mesh_{ld.global_index}_{uuid.uuid4().hex[:6]}"
-            mat_id = f"{ID_PREFIX}Mat_{ld.global_index}_{uuid.uuid4().hex[:6]}"
-            renderer_id = f"{ID_PREFIX}Rend_{ld.global_index}_{uuid.uuid4().hex[:6]}"
-            bulb_color = (1.0, 0.5, 0.2)
+            mesh_id = f"{ID_PREFIX}Mesh_{ld.global_index}_{tag}"
+            mat_id = f"{ID_PREFIX}Mat_{ld.global_index}_{tag}"
+            renderer_id = f"{ID_PREFIX}Rend_{ld.global_index}_{tag}"
 
-            r = await self._send({
+            batch.append(({
                 "$type": "addComponent",
                 "containerSlotId": slot_id,
                 "data": {
                     "id": mesh_id,
                     "componentType": SPHERE_MESH,
-                    "members": {
-                        "Radius": _float_val(SPHERE_RADIUS),
-                        "Segments": _int_val(SPHERE_SEGMENTS),
-                        "Rings": _int_val(SPHERE_RINGS),
-                    },
+                    "members": _SPHERE_MEMBERS,
                 },
-            })
-            self._check_response(r, "addComponent", mesh_id)
+            }, mesh_id))
 
-            r = await self._send({
+            batch.append(({
                 "$type": "addComponent",
                 "containerSlotId": slot_id,
                 "data": {
                     "id": mat_id,
                     "componentType": PBS_METALLIC,
-                    "members": {"AlbedoColor": _color(*bulb_color)},
+                    "members": _BULB_MEMBERS,
                 },
-            })
-            self._check_response(r, "addComponent", mat_id)
+            }, mat_id))
 
-            r = await self._send({
+            batch.append(({
                 "$type": "addComponent",
                 "containerSlotId": slot_id,
                 "data": {"id": renderer_id, "componentType": MESH_RENDERER, "members": {}},
-            })
-            self._check_response(r, "addComponent", renderer_id)
+            }, renderer_id))
 
-            r = await self._send({
+            batch.append(({
                 "$type": "updateComponent",
                 "data": {
                     "id": renderer_id,
@@ -277,43 +483,63 @@ class ResoniteClient:
                         "Materials": _ref_list(mat_id),
                     },
                 },
-            })
-            self._check_response(r, "updateComponent", renderer_id)
+            }, renderer_id))
 
             self._slot_ids.append(slot_id)
             self._component_ids.append(comp_id)
+            self._color_templates.append(_color_update_template(comp_id))
+            self._rotation_templates.append(_rotation_update_template(slot_id))
+            if len(self._slot_ids) % SETUP_BATCH_LIGHTS == 0:
+                await self._send_checked(batch)
+        await self._send_checked(batch)
 
-    async def update_lights(self, states: list[LightState]) -> None:
-        """Send updateComponent (and updateSlot for rotation) for each light (parallel)."""
-        tasks = []
-        for i, state in enumerate(states):
-            if i >= len(self._component_ids):
-                break
-            comp_id = self._component_ids[i]
-            slot_id = self._slot_ids[i] if i < len(self._slot_ids) else None
-            intensity = max(0.0, min(1.0, state.intensity))
-            msg = {
-                "$type": "updateComponent",
-                "data": {
-                    "id": comp_id,
-                    "members": {
-                        "Color": _color(state.r, state.g, state.b),
-                        "Intensity": _float_val(intensity * 2.0),
-                    },
-                },
-            }
-            tasks.append(self._send(msg))
-            if slot_id is not None and state.rotation_y is not None:
-                rot_msg = {
-                    "$type": "updateSlot",
-                    "data": {
-                        "id": slot_id,
-                        "rotation": euler_y_to_quat(state.rotation_y),
-                    },
-                }
-                tasks.append(self._send(rot_msg))
-        if tasks:
-            await asyncio.gather(*tasks)
+    async def update_lights(self, states: np.ndarray) -> None:
+        """
+        Send updateComponent (and updateSlot for rotation) for each light as one pipelined batch.
+        Responses aren't waited for, except every SYNC_EVERY_UPDATES sends (backpressure).
+        states is PatternEngine.compute()'s (n, 5) array: r, g, b, intensity, rotation_y.
+        Color and intensity are quantized to 8 bits; lights whose 8-bit levels (or rotation)
+        didn't change since the last send are skipped.
+        """
+        n = min(len(states), len(self._component_ids))
+        levels = quantize_levels(states[:n, :STATE_ROTATION_Y])
+        rotation = states[:n, STATE_ROTATION_Y].copy()
+        last_levels, last_rotation = self._last_levels, self._last_rotation
+        if last_levels is None or len(last_levels) != n:
+            color_changed = np.ones(n, dtype=bool)
+            rot_changed = ~np.isnan(rotation)
+        else:
+            color_changed = np.any(levels != last_levels, axis=1)
+            rot_changed = ~np.isnan(rotation) & (rotation != last_rotation)
+        message_ids = []
+        payloads = []
+        for i in np.flatnonzero(color_changed).tolist():
+            r, g, b, intensity = levels[i].tolist()
+            message_ids.append(message_id := self._next_message_id())
+            payloads.append(self._color_templates[i] % (
+                message_id, _LEVEL_JSON[r], _LEVEL_JSON[g], _LEVEL_JSON[b], _INTENSITY_JSON[intensity]
+            ))
+        rot_idx = np.flatnonzero(rot_changed[: len(self._rotation_templates)])
+        if len(rot_idx):
+            # Quaternion about Y for all rotated lights at once: (0, sin(a/2), 0, cos(a/2))
+            half = rotation[rot_idx].astype(np.float64) / 2
+            for i, sin_half, cos_half in zip(
+                rot_idx.tolist(), np.sin(half).tolist(), np.cos(half).tolist()
+            ):
+                message_ids.append(message_id := self._next_message_id())
+                payloads.append(self._rotation_templates[i] % (message_id, sin_half, cos_half))
+        if payloads:
+            self._updates_since_sync += 1
+            if self._updates_since_sync >= SYNC_EVERY_UPDATES:
+                self._updates_since_sync = 0
+                if not await self._send_synced(message_ids, payloads):
+                    # Some of this frame may not have landed: resend every light next frame
+                    self._last_levels = self._last_rotation = None
+                    return
+            else:
+                await self._send_payloads_nowait(message_ids, payloads)
+        # Only now count the frame as delivered (a failed send raises before this)
+        self._last_levels, self._last_rotation = levels, rotation
 
     async def teardown(self) -> None:
         """Remove our root slot and all lights."""
@@ -325,3 +551,6 @@ class ResoniteClient:
             self._root_slot_id = ""
             self._slot_ids = []
             self._component_ids = []
+            self._color_templates = []
+            self._rotation_templates = []
+            self._last_levels = None